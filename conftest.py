@@ -0,0 +1,19 @@
+# Copyright 2018-2024 Carnegie Mellon University
+
+import pytest
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", default=False,
+                     help="also run the tests marked as slow")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers",
+                            "slow: a long running test, skipped unless --run-slow is given")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip = pytest.mark.skip(reason="slow, use --run-slow to run")
+    for item in items:
+        if item.get_closest_marker("slow"):
+            item.add_marker(skip)
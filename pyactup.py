@@ -56,9 +56,8 @@ from dataclasses import dataclass, field
 from collections import defaultdict
 from contextlib import contextmanager
 from itertools import count
-from numbers import Real
+from numbers import Integral, Real
 from prettytable import PrettyTable
-from pylru import lrucache
 from warnings import warn
 
 __all__ = ["__version__", "Memory"]
@@ -71,8 +70,14 @@ MINIMUM_TEMPERATURE = 0.01
 
 REFERENCES_FACTOR = 4
 SIMILARITY_CACHE_SIZE = 10_000
+SIGNATURE_CACHE_SIZE = 10_000
+CANDIDATES_CACHE_SIZE = 1_000
 MAXIMUM_RANDOM_SEED = 2**62
 
+# blended values and aggregate probabilities this close together are treated as ties, as
+# they may differ only in how their floating point operations were rounded
+TIE_TOLERANCE = 1e-9
+
 class Memory(dict):
     """A cognitive entity containing a collection of learned things, its chunks.
     A ``Memory`` object also contains a current time, which can be queried as the
@@ -142,6 +147,9 @@ class Memory(dict):
         self._minimum_similarity = 0
         self._maximum_similarity = 1
         self._similarities = defaultdict(Similarity)
+        self._signatures = dict()
+        self._candidates = dict()
+        self._base_levels = None
         self._extra_activation = None
         self.noise = noise
         self.decay = decay
@@ -157,6 +165,7 @@ class Memory(dict):
         self.use_actr_similarity = use_actr_similarity
         self._slot_name_index = defaultdict(list)
         self._indexed_attributes = set()
+        self._index_order = ()
         self._index = defaultdict(list)
         self.index = index
         self._activation_history = None
@@ -167,6 +176,31 @@ class Memory(dict):
     def __repr__(self):
         return f"<Memory {id(self)}: {list(self._indexed_attributes)}, {len(self)}, {self._time}>"
 
+    def __getstate__(self):
+        # The caches are left out of pickles, and rebuilt when unpickled. The marker
+        # distinguishes these pickles from those of PyACTUp 2.2.3 and earlier.
+        state = self.__dict__.copy()
+        for name in ("_signatures", "_candidates", "_base_levels", "_index_order"):
+            del state[name]
+        state["_ring_references"] = True
+        return state
+
+    def __setstate__(self, state):
+        if not state.pop("_ring_references", False):
+            # PyACTUp 2.2.3 and earlier kept the references retained by optimized learning
+            # in chronological order, rather than as a ring buffer with the oldest at the
+            # index of the next one to be written.
+            if ol := state["_optimized_learning"]:
+                for chunks in state["_slot_name_index"].values():
+                    for c in chunks:
+                        if c._reference_count > ol:
+                            c._references = np.roll(c._references, c._reference_count % ol)
+        self.__dict__.update(state)
+        self._signatures = dict()
+        self._candidates = dict()
+        self._base_levels = None
+        self._set_indexed_attributes(self._indexed_attributes)
+
     def reset(self, preserve_prepopulated=False, index=None):
         """Deletes this :class:`Memory`'s chunks and resets its time to zero.
         If *preserve_prepopulated* is ``False`` it deletes all chunks; if it is ``True``
@@ -181,12 +215,15 @@ class Memory(dict):
         if preserve_prepopulated:
             preserved = {k: c for k, c in self.items() if c._creation <= 0}
             for c in preserved.values():
-                c._references = np.array([r for r in c._references[:c._reference_count]
-                                          if r <= 0])
-                c._reference_count = len(c._references)
+                references = c._references[:c._reference_count]
+                # boolean indexing copies, and keeps the dtype of the references array
+                c._references = references[references <= 0]
+                c._reference_count = c._references.size
         self.clear()
         self._slot_name_index.clear()
         self._index.clear()
+        self._candidates.clear()
+        self._base_levels = None
         self._clear_fixed_noise()
         self._activation_history = None
         self._time = 0
@@ -197,8 +234,7 @@ class Memory(dict):
                 self[k] = c
                 self._slot_name_index[frozenset(c.keys())].append(c)
                 if  self._indexed_attributes:
-                    self._index[Memory._signature(c, "learn", self._indexed_attributes)
-                                ].append(c)
+                    self._index[self._index_key(c)].append(c)
 
     @property
     @contextmanager
@@ -284,7 +320,7 @@ class Memory(dict):
         this ``Memory`` contains chunks an attempt to set the ``index`` will raise
         a :exc:`RuntimeError`.
         """
-        return tuple(sorted(self._indexed_attributes))
+        return self._index_order
 
     @index.setter
     def index(self, value):
@@ -294,7 +330,18 @@ class Memory(dict):
         if self:
             raise RuntimeError("Cannot set the index of a Memory after it contains chunks")
         assert not self._index and not self._slot_name_index
+        self._set_indexed_attributes(indexed_attributes)
+
+    def _set_indexed_attributes(self, indexed_attributes):
         self._indexed_attributes = indexed_attributes
+        # Index keys are built in this, sorted, order, with the names interned so that
+        # building and hashing the keys compares and hashes them as cheaply as possible.
+        self._index_order = tuple(sorted(sys.intern(a) for a in indexed_attributes))
+
+    def _index_key(self, slots):
+        # Like a signature, the sorted items of slots, but restricted to the indexed
+        # attributes, which are already in sorted order.
+        return tuple([(a, slots[a]) for a in self._index_order])
 
     @staticmethod
     def is_real(x, name, non_negative=True, positive=False, none_allowed=True):
@@ -323,8 +370,9 @@ class Memory(dict):
     @time.setter
     def time(self, value):
         Memory.is_real(value, "time", False, False, False)
+        changed = value != self._time
         self._time = value
-        if value != self._time:
+        if changed:
             self._clear_fixed_noise()
 
     def advance(self, amount=1):
@@ -339,8 +387,10 @@ class Memory(dict):
             base-level activations and raise an :exc:`Exception`.
         """
         Memory.is_real(amount, "time increment", False)
-        if amount is not None:
-            self.time += amount
+        if amount:
+            # the amount has already been checked, so the time setter is bypassed; any
+            # fixed noise is discarded by _activations() once it sees the time changed
+            self._time += amount
         return self._time
 
     @property
@@ -775,7 +825,7 @@ class Memory(dict):
                      "chunk contents": dict(k).__repr__()[1:-1],
                      "chunk created at": c._creation,
                      "chunk reference count": c._reference_count,
-                     "chunk references": Memory._elide_long_list(c._references[:c._reference_count])}
+                     "chunk references": Memory._elide_long_list(c.references)}
                     for k, c in self.items()]
             if pretty:
                 tab = PrettyTable()
@@ -836,7 +886,47 @@ class Memory(dict):
         <Chunk 0000 {'color': 'red', 'size': 4} 2>
         """
         slots = self._ensure_slots(slots, True)
-        signature = Memory._signature(slots, "learn")
+        result = self._learn(slots, self._interned_signature(slots, "learn"))
+        if advance is True:
+            self.advance()
+        elif advance is not None:
+            self.advance(advance)
+        return result
+
+    def learn_many(self, iterable, advance=None):
+        """Adds, or reinforces, a chunk for each of the :class:`Mapping` objects in
+        *iterable*, all at the current time. This is equivalent to calling :meth:`learn`
+        on each of them in turn, except that if *advance* is not None :meth:`advance` is called
+        only once, after all the chunks have been learned, with *advance* as its
+        argument, or without any argument if *advance* is ``True``.
+
+        Returns a list, in the same order as *iterable*, of what :meth:`learn` would
+        have returned for each: the chunk created if a new chunk has been created,
+        and ``None`` if instead an already existing chunk has been reinforced.
+
+        Raises the same exceptions as :meth:`learn`. All the *slots* are checked before
+        any are learned, so if an exception is raised nothing has been learned.
+
+        >>> m = Memory()
+        >>> m.learn_many([{"color":"red", "size":4},
+        ...               {"color":"blue", "size":4},
+        ...               {"size":4, "color":"red"}], advance=True)
+        [<Chunk 0000 {'color': 'red', 'size': 4} 2>, <Chunk 0001 {'color': 'blue', 'size': 4} 1>, None]
+        >>> m.time
+        1
+        """
+        checked = []
+        for slots in iterable:
+            slots = self._ensure_slots(slots, True)
+            checked.append((slots, self._interned_signature(slots, "learn")))
+        result = [self._learn(slots, signature) for slots, signature in checked]
+        if advance is True:
+            self.advance()
+        elif advance is not None:
+            self.advance(advance)
+        return result
+
+    def _learn(self, slots, signature):
         created = False
         if not (chunk := self.get(signature)):
             chunk = Chunk(self, slots)
@@ -844,13 +934,9 @@ class Memory(dict):
             self[signature] = chunk
             self._slot_name_index[frozenset(slots.keys())].append(chunk)
             if  self._indexed_attributes:
-                self._index[Memory._signature(chunk, "learn", self._indexed_attributes)
-                            ].append(chunk)
+                self._index[self._index_key(chunk)].append(chunk)
+            self._candidates.clear()
         self._cite(chunk)
-        if advance is True:
-            self.advance()
-        elif advance is not None:
-            self.advance(advance)
         return chunk if created else None
 
     @staticmethod
@@ -885,17 +971,28 @@ class Memory(dict):
         return slots
 
     @staticmethod
-    def _signature(slots, fname, attributes=None):
-        if attributes is not None:
-            result = tuple(sorted({a: slots[a] for a in attributes}.items()))
-        elif not (result := tuple(sorted(slots.items()))):
+    def _signature(slots, fname):
+        if not (result := tuple(sorted(slots.items()))):
             if fname:
                 raise ValueError(f"No attributes provided to {fname}()")
             else:
                 raise ValueError(f"No attributes provided")
         return result
 
+    def _interned_signature(self, slots, fname):
+        # The same slots are typically learned over and over, so rather than sorting
+        # them each time cache the signature, keyed by the slots in the order given.
+        # This also means the same signature object is repeatedly used for lookups.
+        key = tuple(slots.items())
+        if (result := self._signatures.get(key)) is None:
+            result = Memory._signature(slots, fname)
+            if len(self._signatures) >= SIGNATURE_CACHE_SIZE:
+                self._signatures.clear()
+            self._signatures[key] = result
+        return result
+
     def _cite(self, chunk):
+        self._base_levels = None
         if self._optimized_learning is None:
             if chunk._reference_count >= chunk._references.size:
                 chunk._references.resize(REFERENCES_FACTOR * chunk._references.size,
@@ -908,8 +1005,9 @@ class Memory(dict):
                                          refcheck=False)
             chunk._references[chunk._reference_count] = self._time
         elif self._optimized_learning:
-            chunk._references[:-1] = chunk._references[1:]
-            chunk._references[-1] = self._time
+            # once full the references array is used as a ring buffer, the oldest
+            # retained reference being at the index of the next one to be written
+            chunk._references[chunk._reference_count % self._optimized_learning] = self._time
         chunk._reference_count += 1
 
     def forget(self, slots, when):
@@ -930,26 +1028,30 @@ class Memory(dict):
         if self._optimized_learning is not None:
             raise RuntimeError("The forget() method cannot be used with optimized learning")
         slots = self._ensure_slots(slots, True)
-        signature = Memory._signature(slots, "forget")
+        signature = self._interned_signature(slots, "forget")
         chunk = self.get(signature)
         if not chunk:
             return False
-        try:
-            i = np.where(chunk._references == when)[0][0]
-        except IndexError:
+        # only the first _reference_count entries are live, those beyond are stale
+        live = chunk._references[:chunk._reference_count]
+        matches = np.flatnonzero(live == when)
+        if not matches.size:
             return False
-        if i < chunk._reference_count:
-            chunk._references[i:chunk._reference_count-1] = chunk._references[i+1:chunk._reference_count]
+        i = matches[0]
+        live[i:-1] = live[i+1:]
         chunk._reference_count -= 1
+        self._base_levels = None
         if not chunk._reference_count:
             self._slot_name_index[frozenset(chunk.keys())].remove(chunk)
             del self[signature]
+            self._candidates.clear()
             if self._indexed_attributes:
-                self._index[Memory._signature(chunk, "forget", self._indexed_attributes)
-                            ].remove(chunk)
+                self._index[self._index_key(chunk)].remove(chunk)
         return True
 
-    def _activations(self, conditions, extra=None, partial=True):
+    def _activations(self, conditions, extra=None, partial=True, deterministic=False):
+        # If deterministic is true neither is noise added nor the threshold applied,
+        # leaving both to the caller.
         slot_names = conditions.keys()
         if extra:
             slot_names = set(slot_names)
@@ -966,112 +1068,144 @@ class Memory(dict):
             exact_slots = list(conditions.items())
         if self._indexed_attributes and (set(a[0] for a in exact_slots)
                                          == self._indexed_attributes):
-            chunks = self._index[Memory._signature(conditions,
-                                                   None,
-                                                   self._indexed_attributes)]
+            chunks = self._index[self._index_key(conditions)]
         else:
-            chunks = []
-            for k, candidates in self._slot_name_index.items():
-                if slot_names <= k: # subset
-                    for c in candidates:
-                        if not all(c[n] == v for n, v in exact_slots):
-                            continue
-                        chunks.append(c)
+            try:
+                # a hashed subset test is much quicker than comparing slot by slot
+                wanted = frozenset(exact_slots)
+            except TypeError:
+                # some value sought is unhashable, so fall back to comparing them
+                wanted = None
+            # The candidates for the same conditions are remembered until a chunk is
+            # next created or deleted, since the same retrieval is often repeated while
+            # only reinforcing existing chunks.
+            key = (wanted, frozenset(slot_names)) if wanted is not None else None
+            if key is None or (chunks := self._candidates.get(key)) is None:
+                chunks = []
+                for k, candidates in self._slot_name_index.items():
+                    if slot_names <= k: # subset
+                        if wanted is not None:
+                            chunks.extend(c for c in candidates if wanted <= c._key)
+                        else:
+                            chunks.extend(c for c in candidates
+                                          if all(c[n] == v for n, v in exact_slots))
+                if key is not None:
+                    if len(self._candidates) >= CANDIDATES_CACHE_SIZE:
+                        self._candidates.clear()
+                    self._candidates[key] = chunks
         if len(chunks) == 0:
             return None, None, 0
         nchunks = len(chunks)
+        raw_activations_count = nchunks
         with np.errstate(divide="raise", over="raise", under="ignore", invalid="raise"):
             try:
-                if self._decay is not None:
-                    if self._optimized_learning is None:
-                        result = np.empty(nchunks)
-                        for c, i in zip(chunks, count()):
-                            result[i] = np.sum((self._time - c._references[0:c._reference_count])
-                                               ** -self._decay)
-                        result = np.log(result)
-                    elif self._optimized_learning == 0:
-                        counts = np.empty(nchunks)
-                        ages = np.empty(nchunks)
-                        for c, i in zip(chunks, count()):
-                            counts[i] = c._reference_count
-                            ages[i] = self._time - c._creation
-                        result = (np.log(counts / (1 - self._decay))
-                                  - self._decay * np.log(ages))
+                # The base level activations of the same candidates at the same time are
+                # remembered until some chunk is next cited or forgotten, as several
+                # conditions often share their candidates, notably when best_blend()
+                # partially matches each of its alternatives against the same chunks.
+                now = self._time
+                decay = self._decay
+                ol = self._optimized_learning
+                remembered = ((memo := self._base_levels) is not None and memo[0] is chunks
+                              and memo[1:4] == (now, decay, ol))
+                if remembered:
+                    result = memo[4].copy()
+                elif decay is not None:
+                    if ol is None:
+                        result = self._log_reference_sums(chunks)
+                    elif ol == 0:
+                        counts = np.fromiter((c._reference_count for c in chunks),
+                                             dtype=np.float64, count=nchunks)
+                        ages = now - np.fromiter((c._creation for c in chunks),
+                                                 dtype=np.float64, count=nchunks)
+                        result = np.log(counts / (1 - decay)) - decay * np.log(ages)
                     else:
-                        result = np.empty(nchunks)
-                        counts = np.ma.masked_all(nchunks)
-                        ages = np.ma.masked_all(nchunks)
-                        middles = np.ma.masked_all(nchunks)
-                        for c, i in zip(chunks, count()):
-                            if c._reference_count <= self._optimized_learning:
-                                result[i] = np.sum((self._time - c._references[0:c._reference_count])
-                                                   ** -self._decay)
-                            else:
-                                result[i] = np.sum((self._time - c._references[0:self._optimized_learning])
-                                                   ** -self._decay)
-                                counts[i] = c._reference_count
-                                ages[i] = self._time - c._creation
-                                middles[i] = c._references[0]
-                        dd = 1 - self._decay
-                        counts -= self._optimized_learning
-                        diff = ages - middles
-                        diff *= dd
-                        ages **= dd
-                        middles **= dd
-                        tmp = ages
-                        tmp -= middles
-                        tmp *= counts
-                        tmp /= diff
-                        result = np.log(result + tmp.filled(0))
+                        result = self._reference_sums(chunks, ol)
+                        # those chunks with more references than are retained get an
+                        # approximation of the remainder added
+                        full = [i for i, c in zip(count(), chunks) if c._reference_count > ol]
+                        if full:
+                            counts = np.array([chunks[i]._reference_count for i in full],
+                                              dtype=np.float64)
+                            ages = np.array([now - chunks[i]._creation for i in full],
+                                            dtype=np.float64)
+                            middles = np.array([chunks[i]._references[
+                                                    chunks[i]._reference_count % ol]
+                                                for i in full],
+                                               dtype=np.float64)
+                            dd = 1 - decay
+                            with np.errstate(divide="ignore", invalid="ignore"):
+                                tmp = ((ages ** dd - middles ** dd) * (counts - ol)
+                                       / ((ages - middles) * dd))
+                            # as with masked arrays, terms that cannot be computed are
+                            # just left out
+                            tmp[~np.isfinite(tmp)] = 0
+                            result[full] += tmp
+                        result = np.log(result)
                 else:
                     result = np.zeros(nchunks)
+                if not remembered:
+                    self._base_levels = (chunks, now, decay, ol, result.copy())
                 if self._activation_history is not None:
-                    initial_history_length = len(self._activation_history)
-                    for c, r in zip(chunks, result):
-                        self._activation_history.append({"time": self.time,
-                                                         "name": c._name,
-                                                         "creation_time": c._creation,
-                                                         "attributes": tuple(c.items()),
-                                                         "reference_count": c.reference_count,
-                                                         "references": c.references,
-                                                         "base_level_activation": r})
-                if self._noise:
-                    if self._noise_distribution is not None:
-                        noise = self._noise * np.array([self._noise_distribution()
-                                                        for i in range(nchunks)],
-                                                       dtype=np.float64)
+                    # the details are collected locally, and only added to the
+                    # activation_history, which may be any MutableSequence, at the end
+                    history = [{"time": self.time,
+                                "name": c._name,
+                                "creation_time": c._creation,
+                                "attributes": tuple(c.items()),
+                                "reference_count": c._reference_count,
+                                "references": c.references,
+                                "base_level_activation": r}
+                               for c, r in zip(chunks, result)]
+                else:
+                    history = None
+                if self._noise and not deterministic:
+                    if self._fixed_noise is None:
+                        noise = self._make_noise(nchunks)
                     else:
-                        noise = self._rng.logistic(scale=self._noise, size=nchunks)
-                    if self._fixed_noise is not None:
                         if self._fixed_noise_time != self._time:
-                            self._clear_fixed_noise()
-                            for c, s in zip(chunks, noise):
-                                self._fixed_noise[c._name] = s
-                        else:
-                            for c, s, i in zip(chunks, noise, count()):
-                                if x := self._fixed_noise.get(c._name):
-                                    noise[i] = x
-                                else:
-                                    self._fixed_noise[c._name] = s
+                            self._fixed_noise.clear()
+                            self._fixed_noise_time = self._time
+                        # only draw noise for those chunks that don't already have some
+                        noise = np.array([self._fixed_noise.get(c._name, np.nan)
+                                          for c in chunks])
+                        missing = np.flatnonzero(np.isnan(noise))
+                        if missing.size:
+                            noise[missing] = self._make_noise(missing.size)
+                            for i in missing:
+                                self._fixed_noise[chunks[i]._name] = noise[i]
                     result += noise
-                    if self._activation_history is not None:
-                        for i, s in zip(count(initial_history_length), noise):
-                            self._activation_history[i]["activation_noise"] = s
+                    if history is not None:
+                        for h, s in zip(history, noise):
+                            h["activation_noise"] = s
+                if (partial_slots and self._threshold is not None and not deterministic
+                        and history is None and self._extra_activation is None):
+                    # mismatch penalties are never positive, so any chunks already below
+                    # the threshold can be discarded before computing any similarities
+                    keep = result >= self._threshold
+                    if not keep.all():
+                        chunks = [c for c, k in zip(chunks, keep) if k]
+                        result = result[keep]
+                        nchunks = len(chunks)
                 if partial_slots:
                     penalties = np.empty((nchunks, len(partial_slots)))
-                    for c, row in zip(chunks, count()):
-                        penalties[row] = [s._similarity(c[n], v) for n, v, s in partial_slots]
-                    if self._activation_history is not None:
+                    for (n, v, s), col in zip(partial_slots, count()):
+                        # many chunks typically share values, so only look up the
+                        # similarity of each distinct value once
+                        values = [c[n] for c in chunks]
+                        sims = {x: s._similarity(x, v) for x in set(values)}
+                        penalties[:, col] = np.fromiter(map(sims.__getitem__, values),
+                                                        dtype=np.float64, count=nchunks)
+                    if history is not None:
                         offset = 0 if self.use_actr_similarity else 1
-                        for i, pens in zip(count(initial_history_length), penalties):
-                            similarities = {ps[0]: p + offset
-                                            for ps, p in zip(partial_slots, pens)}
-                            self._activation_history[i]["similarities"] = similarities
+                        for h, pens in zip(history, penalties):
+                            h["similarities"] = {ps[0]: p + offset
+                                                 for ps, p in zip(partial_slots, pens)}
                     penalties = np.sum(penalties, 1) * self._mismatch
                     result += penalties
-                    if self._activation_history is not None:
-                        for i, p in zip(count(initial_history_length), penalties):
-                            self._activation_history[i]["mismatch"] = p
+                    if history is not None:
+                        for h, p in zip(history, penalties):
+                            h["mismatch"] = p
                 if self._extra_activation is not None:
                     extra_activations = np.empty((nchunks))
                     try:
@@ -1080,20 +1214,23 @@ class Memory(dict):
                     except:
                         raise RuntimeError("Error attempting to compute extra activation values")
                     result += extra_activations
-                    if self._activation_history is not None:
-                        for i, ea in zip(count(initial_history_length), extra_activations):
-                            self._activation_history[i]["extra_activation"] = ea
-                if self._activation_history is not None:
-                    for i, r in zip(count(initial_history_length), result):
-                        self._activation_history[i]["activation"] = r
-                        if self._threshold is not None:
-                            self._activation_history[i]["meets_threshold"] = (r >= self._threshold)
-                raw_activations_count = len(result)
-                if self._threshold is not None:
-                    m = np.ma.masked_less(result, self._threshold)
-                    if np.ma.is_masked(m):
-                        chunks = np.ma.array(chunks, mask=np.ma.getmask(m)).compressed()
-                        result = m.compressed()
+                    if history is not None:
+                        for h, ea in zip(history, extra_activations):
+                            h["extra_activation"] = ea
+                if history is not None:
+                    if self._threshold is None:
+                        for h, r in zip(history, result):
+                            h["activation"] = r
+                    else:
+                        for h, r, t in zip(history, result, result >= self._threshold):
+                            h["activation"] = r
+                            h["meets_threshold"] = t
+                    self._activation_history.extend(history)
+                if self._threshold is not None and not deterministic:
+                    keep = result >= self._threshold
+                    if not keep.all():
+                        chunks = [c for c, k in zip(chunks, keep) if k]
+                        result = result[keep]
             except FloatingPointError as e:
                 raise RuntimeError(f"Error when computing activations, perhaps a chunk's "
                                    f"creation or reinforcement time is not in the past? ({e})")
@@ -1102,6 +1239,57 @@ class Memory(dict):
         else:
             return result, chunks, raw_activations_count
 
+    def _reference_sums(self, chunks, limit=None):
+        # Returns an array of the sums, for each of the chunks, of the ages of its
+        # references, or of at most limit of them, raised to the power -decay. The
+        # references of all the chunks are concatenated so that the powers are computed
+        # in a single NumPy operation, and then summed chunk by chunk with reduceat.
+        # Every chunk has at least one reference, so no segment is empty.
+        if limit is None:
+            lengths = [c._reference_count for c in chunks]
+        else:
+            lengths = [min(c._reference_count, limit) for c in chunks]
+        if self._decay == 0:
+            # every age raised to the power zero is one, so the sums are just the counts
+            return np.array(lengths, dtype=np.float64)
+        starts = np.zeros(len(chunks), dtype=np.intp)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        references = np.concatenate([c._references[:n] for c, n in zip(chunks, lengths)])
+        ages = np.subtract(self._time, references, dtype=np.float64)
+        if self._decay == 0.5:
+            # the default decay, for which a square root is cheaper than a general power
+            np.sqrt(ages, out=ages)
+            np.reciprocal(ages, out=ages)
+        else:
+            np.power(ages, -self._decay, out=ages)
+        return np.add.reduceat(ages, starts)
+
+    def _log_reference_sums(self, chunks):
+        # Returns the logs of _reference_sums(chunks). Should every power summed for a
+        # chunk underflow to zero, as with very old references and a large decay, the
+        # log of its sum is instead computed from the logs of the ages, in log-sum-exp
+        # form, which cannot underflow.
+        sums = self._reference_sums(chunks)
+        if sums.all():
+            return np.log(sums)
+        result = np.empty(len(chunks))
+        nonzero = sums > 0
+        result[nonzero] = np.log(sums[nonzero])
+        for i in np.flatnonzero(~nonzero):
+            c = chunks[i]
+            x = -self._decay * np.log(self._time - c._references[:c._reference_count])
+            largest = np.max(x)
+            result[i] = largest + np.log(np.sum(np.exp(x - largest)))
+        return result
+
+    def _make_noise(self, n):
+        # returns an array of n activation noise values, already scaled by the noise
+        if self._noise_distribution is not None:
+            return self._noise * np.fromiter((self._noise_distribution() for i in range(n)),
+                                             dtype=np.float64, count=n)
+        else:
+            return self._rng.logistic(scale=self._noise, size=n)
+
     def retrieve(self, slots={}, partial=False, rehearse=False):
         """Returns the chunk matching the *slots* that has the highest activation greater than or equal to this Memory's :attr:`threshold`, if any.
         If there is no such matching chunk returns ``None``.
@@ -1135,21 +1323,68 @@ class Memory(dict):
                                                         partial=partial)
         if chunks is None:
             return None
-        max = np.finfo(activations.dtype).min
-        best = []
-        for a, c in zip(activations, chunks):
-            if a < max:
-                pass
-            elif a > max:
-                max = a
-                best = [c]
-            else:
-                best.append(c)
-        result = random.choice(best)
+        result = chunks[random.choice(np.flatnonzero(activations == np.max(activations)))]
         if rehearse and result:
             self._cite(result)
         return result
 
+    def retrieve_many(self, slots={}, n=1, partial=False):
+        """Returns a list of the results of *n* independent retrievals at the current time.
+        The result is the same as calling :meth:`retrieve` *n* times with the given
+        *slots* and *partial* arguments, without advancing the time in between, but is
+        typically computed much more quickly, as the noise free parts of the
+        activations are computed only once, and only the noise is drawn anew for each
+        retrieval. Each element of the list is a chunk, or ``None`` if that retrieval
+        failed.
+
+        When the retrievals cannot be independent of one another, because
+        :attr:`fixed_noise` is in effect, or because their details are being recorded
+        in the :attr:`activation_history`, this does simply call :meth:`retrieve` *n*
+        times.
+
+        Raises a :exc:`ValueError` if *n* is not a non-negative integer.
+
+        >>> m = Memory()
+        >>> m.learn({"color":"red", "size":2})
+        <Chunk 0000 {'color': 'red', 'size': 2} 1>
+        >>> m.advance()
+        1
+        >>> m.learn({"color":"blue", "size":30})
+        <Chunk 0001 {'color': 'blue', 'size': 30} 1>
+        >>> m.advance()
+        2
+        >>> m.learn({"color":"red", "size":1})
+        <Chunk 0002 {'color': 'red', 'size': 1} 1>
+        >>> m.advance()
+        3
+        >>> from collections import Counter
+        >>> Counter(c["size"] for c in m.retrieve_many({"color":"red"}, 1000))
+        Counter({1: 821, 2: 179})
+        """
+        if isinstance(n, bool) or not isinstance(n, Integral) or n < 0:
+            raise ValueError(f"The number of retrievals, {n}, is not a non-negative integer")
+        if self._fixed_noise is not None or self._activation_history is not None:
+            return [self.retrieve(slots, partial) for i in range(n)]
+        activations, chunks, ignore = self._activations(self._ensure_slots(slots),
+                                                        partial=partial,
+                                                        deterministic=True)
+        if chunks is None:
+            return [None] * n
+        if self._noise:
+            noise = self._make_noise(n * len(chunks)).reshape(n, len(chunks))
+            activations = activations + noise
+            # ties are vanishingly unlikely once noise has been added
+            result = [chunks[i] for i in np.argmax(activations, axis=1)]
+            if self._threshold is not None:
+                result = [c if a >= self._threshold else None
+                          for c, a in zip(result, np.max(activations, axis=1))]
+            return result
+        best = np.max(activations)
+        if self._threshold is not None and best < self._threshold:
+            return [None] * n
+        best = [chunks[i] for i in np.flatnonzero(activations == best)]
+        return [random.choice(best) for i in range(n)]
+
     def _blend(self, outcome_attribute, slots, instance_salience, feature_salience):
         Memory._ensure_slot_name(outcome_attribute)
         activations, chunks, raw = self._activations(self._ensure_slots(slots),
@@ -1157,7 +1392,9 @@ class Memory(dict):
         if chunks is None:
             return None, None, None, None
         with np.errstate(divide="raise", over="raise", under="ignore", invalid="raise"):
-            wp = np.exp(activations / self._temperature)
+            # subtracting the maximum activation first can't change the probabilities,
+            # but keeps the exponentials from overflowing
+            wp = np.exp((activations - np.max(activations)) / self._temperature)
             wp /= np.sum(wp)
         if self._activation_history is not None:
             h = self._activation_history
@@ -1173,8 +1410,9 @@ class Memory(dict):
             norm = np.linalg.norm(v)
             return v / norm if norm > 0 else v
         isal = None
-        if instance_salience:
+        if instance_salience or (feature_salience and self._mismatch):
             vals = np.array([c[outcome_attribute] for c in chunks])
+        if instance_salience:
             isal = normalize(wp * (vals - np.sum(wp * vals)) / self._temperature)
         fsal = None
         if feature_salience and self._mismatch is not None:
@@ -1185,10 +1423,13 @@ class Memory(dict):
                     weight = self._similarities[attr]._weight
                     if not deriv:
                         raise RuntimeError(f"No derivative defined for {attr} similarities")
-                    dvals = np.array([weight * deriv(c[attr], attrval) for c in chunks])
+                    # as with mismatch penalties, the derivative is only computed once
+                    # for each distinct value
+                    values = [c[attr] for c in chunks]
+                    derivs = {x: weight * deriv(x, attrval) for x in set(values)}
+                    dvals = np.array([derivs[x] for x in values])
                     dsum = np.sum(wp * dvals)
-                    return np.sum(wp * (dvals - dsum) * np.array([c[outcome_attribute]
-                                                                  for c in chunks]))
+                    return np.sum(wp * (dvals - dsum) * vals)
                 # Doing the division up front could make for loss of precision
                 # but this is unlikely to matter in any realistic use case.
                 coef = self._mismatch / self._temperature
@@ -1248,9 +1489,9 @@ class Memory(dict):
         if chunks is not None:
             with np.errstate(divide="raise", over="raise", under="ignore", invalid="raise"):
                 try:
-                    result = np.average(np.array([c[outcome_attribute] for c in chunks],
-                                                 dtype=np.float64),
-                                        weights=probs)
+                    # the probabilities already sum to one
+                    result = np.array([c[outcome_attribute] for c in chunks],
+                                      dtype=np.float64) @ probs
                 except Exception as e:
                     raise RuntimeError(f"Error computing blended value, is perhaps the value "
                                        f"of the {outcome_attribute} slotis not numeric in "
@@ -1276,9 +1517,10 @@ class Memory(dict):
         passing as the *slots* argument to :meth:`blend`. The first
         return value is the *iterable* value producing the best blended value, and the
         second is that blended value. If there is a tie, with two or more *iterable* values
-        all producing the same, best blended value, then one of them is chosen randomly. If
-        none of the values from *iterable* result in blended values of *outcome_attribute*
-        then both return values are ``None``.
+        all producing the same, best blended value, or values differing only in how they
+        were rounded, then one of them is chosen randomly. If none of the values from
+        *iterable* result in blended values of *outcome_attribute* then both return values
+        are ``None``.
 
         This operation is particularly useful for building `Instance Based Learning models
         <https://www.sciencedirect.com/science/article/abs/pii/S0364021303000314>`_.
@@ -1327,7 +1569,8 @@ class Memory(dict):
             value = self.blend(outcome_attribute, slots)
             if value is None:
                 pass
-            elif value == best_value:
+            elif math.isclose(value, best_value,
+                              rel_tol=TIE_TOLERANCE, abs_tol=TIE_TOLERANCE):
                 best_args.append(slots)
             elif comparator(value, best_value):
                 best_args = [ slots ]
@@ -1370,21 +1613,17 @@ class Memory(dict):
         probs, chunks, isal, fsal = self._blend(outcome_attribute, slots, False, False)
         if not chunks:
             return None, None
-        candidates = defaultdict(list)
-        for c, p in zip(chunks, probs):
-            candidates[c[outcome_attribute]].append(p)
-        best = []
-        best_value = -math.inf
-        for k, v in candidates.items():
-            v = sum(v)
-            candidates[k] = v
-            if v > best_value:
-                best = [k]
-                best_value = v
-            elif v == best_value:
-                best.append(k)
+        # number the distinct outcome values in order of first appearance, and then
+        # total the probabilities of each number
+        codes = {}
+        numbers = [codes.setdefault(c[outcome_attribute], len(codes)) for c in chunks]
+        totals = np.bincount(numbers, weights=probs, minlength=len(codes))
+        values = list(codes)
+        best = [values[i] for i in np.flatnonzero(np.isclose(totals, np.max(totals),
+                                                             rtol=TIE_TOLERANCE,
+                                                             atol=TIE_TOLERANCE))]
         return (random.choice(best),
-                dict(sorted(candidates.items(), key=lambda x: x[1], reverse=True)))
+                dict(sorted(zip(values, totals), key=lambda x: x[1], reverse=True)))
 
     def similarity(self, attributes, function=None, weight=None, derivative=None):
         """Assigns a similarity function and/or corresponding weight to be used when comparing attribute values with the given *attributes*.
@@ -1467,7 +1706,8 @@ class Chunk(dict):
     `[]` notation, or with `.get()`.
     """
 
-    __slots__ = ["_name", "_memory", "_creation", "_references", "_reference_count" ]
+    __slots__ = ["_name", "_memory", "_creation", "_references", "_reference_count",
+                 "_key" ]
 
     _name_counter = 0;
 
@@ -1476,6 +1716,7 @@ class Chunk(dict):
         Chunk._name_counter += 1
         self._memory = memory
         self.update(content)
+        self._key = frozenset(self.items())
         self._creation = memory._time
         self._references = np.empty(1 if self._memory._optimized_learning != 0 else 0,
                                     dtype=np.int32)
@@ -1484,6 +1725,21 @@ class Chunk(dict):
     def __repr__(self):
         return "<Chunk {} {} {}>".format(self._name, dict(self), self._reference_count)
 
+    def __reduce__(self):
+        # The items are passed to the reconstructor, rather than set after the state as
+        # usual for a dict, so that they are present when __setstate__() recomputes _key,
+        # which is left out of the state.
+        return (_restore_chunk, (dict(self),),
+                {name: getattr(self, name) for name in Chunk.__slots__ if name != "_key"})
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # as pickled by PyACTUp 2.2.3 and earlier, an empty instance dict and the slots
+            state = state[1]
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._key = frozenset(self.items())
+
     def __str__(self):
         return f"Chunk-{self._name}"
 
@@ -1505,10 +1761,18 @@ class Chunk(dict):
         reinforcements, or an empty list, depending upon the value of
         :attr:`optimized_learning`.
         """
-        return tuple(self._references[:(self._reference_count
-                                        if self._memory._optimized_learning is None
-                                        else min(self._reference_count,
-                                                 self._memory._optimized_learning))])
+        n = self._memory._optimized_learning
+        if n is None or self._reference_count <= n:
+            return tuple(self._references[:self._reference_count])
+        elif n == 0:
+            return ()
+        # a full ring buffer, so rotate it to put the oldest reference first
+        return tuple(np.roll(self._references, -(self._reference_count % n)))
+
+def _restore_chunk(items):
+    chunk = Chunk.__new__(Chunk)
+    dict.update(chunk, items)
+    return chunk
 
 
 @dataclass
@@ -1517,7 +1781,17 @@ class Similarity:
     _function: callable = True
     _derivative: callable = None
     _weight: float = 1.0
-    _cache: lrucache = field(default_factory=lambda: lrucache(SIMILARITY_CACHE_SIZE))
+    _cache: dict = field(default_factory=dict)
+
+    def __getstate__(self):
+        # the cache is left out of pickles, and starts out empty when unpickled
+        state = self.__dict__.copy()
+        del state["_cache"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = dict()
 
     def _similarity(self, x, y):
         # returns the mismatch penalty, a non-positive number that has already been
@@ -1527,8 +1801,7 @@ class Similarity:
         if self._function is True:
             return -self._weight
         signature = (x, y)
-        result = self._cache.get(signature)
-        if result is not None:
+        if (result := self._cache.get(signature)) is not None:
             return result
         result = self._function(x, y)
         if result < self._memory._minimum_similarity:
@@ -1540,6 +1813,10 @@ class Similarity:
         if not self._memory._use_actr_similarity:
             result -= 1
         result *= self._weight
+        if len(self._cache) >= SIMILARITY_CACHE_SIZE:
+            # a plain dict, emptied when full, is much cheaper to consult than an LRU
+            # cache, and similarities are rarely so varied as to fill it repeatedly
+            self._cache.clear()
         self._cache[signature] = result
         self._cache[(y, x)] = result
         return result
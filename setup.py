@@ -17,7 +17,6 @@ setup(name="pyactup",
       py_modules=["pyactup"],
       install_requires=[
           "numpy",
-          "pylru",
           "prettytable",
           "packaging"],
       tests_require=["pytest"],